@@ -1,27 +1,25 @@
 # Create the Lead Cleaner app
 import streamlit as st
 import pandas as pd
-import re
 from io import BytesIO
 
 from loaders.google_sheets import load_google_csv, clear_cache
 from loaders.schema import validate_columns
-from loaders.normalize import (
-    extract_email_domain,
-    normalize_domain,
-    normalize_website_to_domain,
-)
+from loaders.normalize import registrable_domain
 
 
 # app.py — Lead Enricher (MVP, separate tool)
 # Reads library tables from Google Sheets (published CSV URLs) defined in config/data_sources.yaml
 # Outputs: enriched_leads.csv, ambiguous_review.csv, dedupe_suggestions.csv
 
-import re
 from io import BytesIO
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
 import streamlit as st
 import yaml
 
@@ -41,7 +39,30 @@ def load_yaml(path: str) -> dict:
 
 @st.cache_data(ttl=600)
 def load_google_csv(url: str) -> pd.DataFrame:
-    return pd.read_csv(url)
+    df = pd.read_csv(url, engine="pyarrow", dtype_backend="pyarrow")
+    # The pyarrow engine names blank export columns "" (not "Unnamed: N"); drop them
+    return df.loc[:, df.columns.astype(str) != ""]
+
+def read_csv_upload(f) -> pd.DataFrame:
+    try:
+        # Every header column read as string: values (zip codes, timestamps) stay verbatim,
+        # and non-UTF-8 bytes raise instead of coming back as binary columns
+        names = pcsv.open_csv(f).schema.names
+        f.seek(0)
+        table = pcsv.read_csv(
+            f,
+            convert_options=pcsv.ConvertOptions(
+                column_types={n: pa.string() for n in names}, strings_can_be_null=True
+            ),
+        )
+        if len(set(names)) == len(names):
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+    except pa.ArrowInvalid:
+        pass
+    # Duplicate headers, short rows or bad UTF-8: the default parser renames (Name.1),
+    # pads with NaN, and raises UnicodeDecodeError on undecodable bytes
+    f.seek(0)
+    return pd.read_csv(f)
 
 def validate_columns(df: pd.DataFrame, required_cols: List[str], name: str) -> None:
     missing = [c for c in required_cols if c not in df.columns]
@@ -49,54 +70,155 @@ def validate_columns(df: pd.DataFrame, required_cols: List[str], name: str) -> N
         st.error(f"❌ `{name}` is missing required columns: {missing}")
         st.stop()
 
-def safe_str(x) -> str:
-    if pd.isna(x):
-        return ""
-    return str(x)
-
 # ---------------------------
 # Helpers: normalization
 # ---------------------------
-def extract_email_domain(email: str) -> Optional[str]:
-    if pd.isna(email):
-        return None
-    s = str(email).strip().lower()
-    if "@" not in s:
-        return None
-    # take right side after last @ just in case
-    return s.split("@")[-1].strip()
-
-def normalize_domain(domain: Optional[str], collapse_subdomains: bool = True) -> Optional[str]:
-    if not domain:
-        return None
-    d = str(domain).strip().lower()
-    d = re.sub(r"^https?://", "", d)
-    d = re.sub(r"^www\.", "", d)
-    d = d.split("/")[0].strip()
-    if not d:
-        return None
-
-    # NOTE: naive subdomain collapse. If you need accurate .co.uk handling later,
-    # we can switch to tldextract with one dependency.
-    if collapse_subdomains and d.count(".") >= 2:
-        parts = d.split(".")
-        d = ".".join(parts[-2:])
+# Email/website domain normalization, applied to a whole column so the loop runs
+# inside pandas' string kernels instead of one Python call per row.
+def _vec_extract_email_domain(emails: pd.Series) -> pd.Series:
+    s = emails.astype("string").str.strip().str.lower()
+    dom = s.str.rsplit("@", n=1).str[-1].str.strip()
+    return dom.where(s.str.contains("@", na=False))
+
+def _vec_normalize_domain(domains: pd.Series, collapse_subdomains: bool = True) -> pd.Series:
+    d = domains.astype("string").str.strip().str.lower()
+    d = d.str.replace(r"^https?://", "", regex=True).str.replace(r"^www\.", "", regex=True)
+    d = d.str.split("/", n=1).str[0].str.strip()
+    d = d.where(d.ne(""))
+
+    if collapse_subdomains:
+        # Suffix lookup once per distinct domain into a preallocated array, then
+        # gathered back to rows by factorize code (-1 = missing → trailing None)
+        codes, uniq = pd.factorize(d)
+        collapsed = np.empty(len(uniq) + 1, dtype=object)
+        for i, u in enumerate(uniq):
+            collapsed[i] = registrable_domain(u)
+        d = pd.Series(collapsed[codes], index=d.index, name=d.name, dtype="string")
 
     return d
 
-def normalize_website_to_domain(website: Optional[str], collapse_subdomains: bool = True) -> Optional[str]:
-    if pd.isna(website) or website is None:
-        return None
-    return normalize_domain(str(website), collapse_subdomains=collapse_subdomains)
-
+@st.cache_data(ttl=600, show_spinner=False)
 def build_alias_map(alias_df: pd.DataFrame, collapse_subdomains: bool) -> Dict[str, str]:
-    m: Dict[str, str] = {}
-    for _, r in alias_df.iterrows():
-        inp = normalize_domain(r.get("InputDomain"), collapse_subdomains=collapse_subdomains)
-        can = normalize_domain(r.get("CanonicalDomain"), collapse_subdomains=collapse_subdomains)
-        if inp and can:
-            m[inp] = can
-    return m
+    inp = _vec_normalize_domain(alias_df["InputDomain"], collapse_subdomains=collapse_subdomains)
+    can = _vec_normalize_domain(alias_df["CanonicalDomain"], collapse_subdomains=collapse_subdomains)
+    mask = inp.notna() & can.notna()
+    return dict(zip(inp[mask].tolist(), can[mask].tolist()))
+
+# ---------------------------
+# Helpers: account index
+# ---------------------------
+class AccountIndex(NamedTuple):
+    domains: pd.Index
+    counts: np.ndarray
+    first_ids: np.ndarray
+    first_names: np.ndarray
+    candidates: np.ndarray
+
+@st.cache_data(ttl=600, show_spinner=False)
+def build_account_index(
+    accounts_df: pd.DataFrame, collapse_subdomains: bool
+) -> AccountIndex:
+    """
+    Builds the domain → accounts lookup arrays used by enrichment.
+    Returns an AccountIndex of:
+      - the distinct account domains (position = domain code)
+      - per-domain candidate count, first AccountId, first AccountName and
+        packed "id|name|domain" candidates (first 10), aligned with the domains
+
+    Each array carries one extra empty slot at the end, so a miss from
+    Index.get_indexer (-1) gathers count 0 / "".
+    """
+    norm = _vec_normalize_domain(accounts_df["Website"], collapse_subdomains=collapse_subdomains)
+    accounts_df = accounts_df.assign(
+        WebsiteDomainNormalized=norm,
+        AccountId=accounts_df["AccountId"].astype("string").fillna(""),
+        AccountName=accounts_df["AccountName"].astype("string").fillna(""),
+    ).dropna(subset=["WebsiteDomainNormalized"])
+
+    acct_by_domain = accounts_df.groupby("WebsiteDomainNormalized", sort=False)
+    sizes = acct_by_domain.size()
+    domains = sizes.index
+
+    counts = np.append(sizes.to_numpy(), 0).astype(np.int32)
+    first_ids = np.append(acct_by_domain["AccountId"].first().to_numpy(dtype=object), "")
+    first_names = np.append(acct_by_domain["AccountName"].first().to_numpy(dtype=object), "")
+
+    # Candidates: "id|name|domain" for the first 10 accounts of each domain, laid out
+    # contiguously per domain as an Arrow list array and folded with " || " in C++
+    top_mask = acct_by_domain.cumcount().to_numpy() < 10
+    top_codes = acct_by_domain.ngroup().to_numpy()[top_mask]
+    top = accounts_df[top_mask].iloc[np.argsort(top_codes, kind="stable")]
+    packed = pc.binary_join_element_wise(
+        *(pa.array(top[c], type=pa.string()) for c in ("AccountId", "AccountName", "WebsiteDomainNormalized")),
+        "|",
+    )
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(top_codes, minlength=len(domains)))))
+    per_domain = pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), packed)
+    candidates = np.append(pc.binary_join(per_domain, " || ").to_numpy(zero_copy_only=False), "")
+    return AccountIndex(domains, counts, first_ids, first_names, candidates)
+
+# ---------------------------
+# Helpers: enrichment
+# ---------------------------
+ENRICH_BATCH_ROWS = 250_000
+
+def enrich_batch(
+    batch: pd.DataFrame,
+    email_col: str,
+    alias_map: Dict[str, str],
+    account_index: AccountIndex,
+    collapse_subdomains: bool,
+    treat_personal_as_unmatched: bool,
+) -> pd.DataFrame:
+    """
+    Matches a batch of leads to accounts by email domain.
+    Returns the batch with the EmailDomain*/DomainCanonical and Suggested*/Match* columns added.
+    """
+    domains, counts, first_ids, first_names, candidates = account_index
+
+    # Shallow copy: new columns land on `work`, the uploaded data is shared
+    work = batch.copy(deep=False)
+
+    # Extract + normalize email domains
+    work["EmailDomainRaw"] = _vec_extract_email_domain(work[email_col])
+    work["EmailDomainNormalized"] = _vec_normalize_domain(
+        work["EmailDomainRaw"], collapse_subdomains=collapse_subdomains
+    )
+
+    # Apply alias canonicalization (unmapped domains pass through unchanged)
+    work["DomainCanonical"] = (
+        work["EmailDomainNormalized"].map(alias_map).astype("string").fillna(work["EmailDomainNormalized"])
+    )
+
+    # Low-cardinality columns: store as int codes + a small dictionary
+    for c in ("EmailDomainRaw", "EmailDomainNormalized", "DomainCanonical"):
+        work[c] = work[c].astype("category")
+
+    # Per-domain checks run once per category, then gather to rows by category code.
+    # The appended slot is what a missing domain (code -1) picks up.
+    cats = work["DomainCanonical"].cat.categories
+    dom_codes = work["DomainCanonical"].cat.codes.to_numpy()
+    personal_by_code = np.fromiter((c in DEFAULT_PERSONAL_DOMAINS for c in cats), dtype=bool, count=len(cats))
+    codes = np.append(domains.get_indexer(cats), -1)[dom_codes]
+
+    is_null = dom_codes < 0
+    is_personal = treat_personal_as_unmatched & np.append(personal_by_code, False)[dom_codes]
+    count = np.where(is_null | is_personal, 0, counts[codes])
+
+    reason_code = np.select([is_null, is_personal, count == 1, count > 1], [0, 1, 2, 3], default=4)
+    single = reason_code == 2
+    has_candidates = single | (reason_code == 3)
+
+    work["SuggestedAccountId"] = np.where(single, first_ids[codes], "")
+    work["SuggestedAccountName"] = np.where(single, first_names[codes], "")
+    work["MatchReason"] = pd.Categorical.from_codes(reason_code, categories=MATCH_REASONS)
+    work["MatchConfidence"] = pd.Categorical.from_codes(
+        REASON_CONFIDENCE[reason_code], categories=MATCH_CONFIDENCES
+    )
+    work["MatchCandidatesCount"] = count.astype(np.int32)
+    work["MatchCandidates"] = np.where(has_candidates, candidates[codes], "")
+
+    return work
 
 # ---------------------------
 # Helpers: dedupe
@@ -108,35 +230,30 @@ def dedupe_by_email(df: pd.DataFrame, email_col: str) -> Tuple[pd.DataFrame, pd.
       - updated df with IsPotentialDuplicate, DuplicateGroupId, DuplicateReason
       - a dedupe suggestions table (may be empty)
     """
-    work = df.copy()
-    work["_email_norm"] = work[email_col].astype(str).str.strip().str.lower()
+    norm = df[email_col].astype("string").str.strip().str.lower()
 
     # Consider only non-empty, non-"nan"
-    valid = work["_email_norm"].ne("") & work["_email_norm"].ne("nan")
-    dup_mask = valid & work["_email_norm"].duplicated(keep=False)
-
-    dup_df = work[dup_mask].copy()
-
-    if dup_df.empty:
-        work["IsPotentialDuplicate"] = False
-        work["DuplicateGroupId"] = ""
-        work["DuplicateReason"] = ""
-        return work.drop(columns=["_email_norm"]), pd.DataFrame()
-
-    # Create group IDs per duplicated email
-    dup_df["DuplicateGroupId"] = (
-        dup_df.groupby("_email_norm").ngroup().apply(lambda x: f"DUP-{x+1:03d}")
+    valid = (norm.notna() & norm.ne("") & norm.ne("nan")).to_numpy(dtype=bool)
+    is_dup = valid & norm.duplicated(keep=False).to_numpy(dtype=bool)
+
+    # Common case: no repeated email, so skip grouping entirely
+    if not is_dup.any():
+        return df.assign(IsPotentialDuplicate=False, DuplicateGroupId="", DuplicateReason=""), pd.DataFrame()
+
+    # Group IDs per duplicated email, numbered in order of first appearance
+    group_codes, _ = pd.factorize(norm[is_dup])
+    group_id = np.full(len(df), "", dtype=object)
+    group_id[is_dup] = np.char.add("DUP-", np.char.zfill((group_codes + 1).astype(str), 3))
+
+    work = df.assign(
+        DuplicateGroupId=group_id,
+        DuplicateReason=np.where(is_dup, "EmailExact", ""),
+        IsPotentialDuplicate=is_dup,
     )
-    dup_df["DuplicateReason"] = "EmailExact"
+    return work, work[is_dup].drop(columns=["IsPotentialDuplicate"])
 
-    # Merge flags back
-    flags = dup_df[[email_col, "DuplicateGroupId", "DuplicateReason"]].drop_duplicates()
-    work = work.merge(flags, on=email_col, how="left")
-    work["IsPotentialDuplicate"] = work["DuplicateGroupId"].notna()
-    work["DuplicateGroupId"] = work["DuplicateGroupId"].fillna("")
-    work["DuplicateReason"] = work["DuplicateReason"].fillna("")
-
-    return work.drop(columns=["_email_norm"]), dup_df.drop(columns=["_email_norm"])
+# Download payload for an empty table (nothing to serialize)
+EMPTY_CSV_BYTES = b""
 
 def df_to_csv_bytes(df: pd.DataFrame) -> BytesIO:
     buf = BytesIO()
@@ -176,6 +293,12 @@ DEFAULT_PERSONAL_DOMAINS = {
     "gmx.com", "gmx.net",
 }
 
+# Enrichment outcome labels; MatchReason codes index into REASON_CONFIDENCE / REASON_BUCKET
+MATCH_REASONS = ["NoEmailDomain", "PersonalEmail", "DomainMatch", "Ambiguous", "NoMatch"]
+MATCH_CONFIDENCES = ["Low", "Medium", "High"]
+REASON_CONFIDENCE = np.array([0, 0, 2, 1, 0], dtype=np.int8)
+REASON_BUCKET = np.array([2, 2, 0, 1, 2], dtype=np.int8)  # 0 = matched, 1 = ambiguous, 2 = unmatched
+
 # Load required library tables
 try:
     accounts_df = load_google_csv(acct_src["url"])
@@ -196,25 +319,15 @@ if contacts_src:
     except Exception:
         contacts_df = None
 
-# Precompute normalized domains for accounts
-accounts_df = accounts_df.copy()
-accounts_df["WebsiteDomainNormalized"] = accounts_df["Website"].apply(
-    lambda x: normalize_website_to_domain(x, collapse_subdomains=collapse_subdomains)
-)
-accounts_df = accounts_df.dropna(subset=["WebsiteDomainNormalized"])
-
-# Build domain → accounts index
-domain_to_accounts: Dict[str, List[pd.Series]] = {}
-for _, r in accounts_df.iterrows():
-    d = r["WebsiteDomainNormalized"]
-    domain_to_accounts.setdefault(d, []).append(r)
+# Domain → accounts index
+account_index = build_account_index(accounts_df, collapse_subdomains=collapse_subdomains)
 
 # Alias map (InputDomain → CanonicalDomain)
 alias_map = build_alias_map(alias_df, collapse_subdomains=collapse_subdomains)
 
 with st.sidebar:
     st.subheader("✅ Library Status")
-    st.write(f"Accounts (with websites): **{len(accounts_df):,}**")
+    st.write(f"Accounts (with websites): **{int(account_index.counts.sum()):,}**")
     st.write(f"Alias rows: **{len(alias_df):,}**")
     st.write(f"Personal domains (built-in): **{len(DEFAULT_PERSONAL_DOMAINS):,}**")
     if contacts_df is not None:
@@ -235,9 +348,9 @@ if not uploaded_file:
 # Read uploaded
 try:
     if uploaded_file.name.lower().endswith(".csv"):
-        leads = pd.read_csv(uploaded_file)
+        leads = read_csv_upload(uploaded_file)
     else:
-        leads = pd.read_excel(uploaded_file)
+        leads = pd.read_excel(uploaded_file, engine="calamine")
 except Exception as e:
     st.error(f"❌ Could not read file: {e}")
     st.stop()
@@ -268,85 +381,28 @@ if st.button("🚀 Enrich Leads", type="primary"):
         st.stop()
 
     with st.spinner("Enriching leads..."):
-        work = leads.copy()
-
-        # Extract + normalize email domains
-        work["EmailDomainRaw"] = work[email_col].apply(extract_email_domain)
-        work["EmailDomainNormalized"] = work["EmailDomainRaw"].apply(
-            lambda d: normalize_domain(d, collapse_subdomains=collapse_subdomains)
-        )
-
-        # Apply alias canonicalization
-        def canonicalize(d: Optional[str]) -> Optional[str]:
-            if not d:
-                return None
-            return alias_map.get(d, d)
-
-        work["DomainCanonical"] = work["EmailDomainNormalized"].apply(canonicalize)
-
-        suggested_ids: List[str] = []
-        suggested_names: List[str] = []
-        reasons: List[str] = []
-        confidences: List[str] = []
-        candidate_counts: List[int] = []
-        candidates_list: List[str] = []
-
-        for d in work["DomainCanonical"].tolist():
-            if not d:
-                suggested_ids.append("")
-                suggested_names.append("")
-                reasons.append("NoEmailDomain")
-                confidences.append("Low")
-                candidate_counts.append(0)
-                candidates_list.append("")
-                continue
-
-            if treat_personal_as_unmatched and d in DEFAULT_PERSONAL_DOMAINS:
-                suggested_ids.append("")
-                suggested_names.append("")
-                reasons.append("PersonalEmail")
-                confidences.append("Low")
-                candidate_counts.append(0)
-                candidates_list.append("")
-                continue
-
-            candidates = domain_to_accounts.get(d, [])
-            candidate_counts.append(len(candidates))
-
-            if len(candidates) == 1:
-                a = candidates[0]
-                suggested_ids.append(safe_str(a.get("AccountId")))
-                suggested_names.append(safe_str(a.get("AccountName")))
-                reasons.append("DomainMatch")
-                confidences.append("High")
-                candidates_list.append(f'{safe_str(a.get("AccountId"))}|{safe_str(a.get("AccountName"))}|{d}')
-            elif len(candidates) > 1:
-                suggested_ids.append("")
-                suggested_names.append("")
-                reasons.append("Ambiguous")
-                confidences.append("Medium")
-                packed = []
-                for a in candidates[:10]:
-                    packed.append(f'{safe_str(a.get("AccountId"))}|{safe_str(a.get("AccountName"))}|{d}')
-                candidates_list.append(" || ".join(packed))
-            else:
-                suggested_ids.append("")
-                suggested_names.append("")
-                reasons.append("NoMatch")
-                confidences.append("Low")
-                candidates_list.append("")
-
-        work["SuggestedAccountId"] = suggested_ids
-        work["SuggestedAccountName"] = suggested_names
-        work["MatchReason"] = reasons
-        work["MatchConfidence"] = confidences
-        work["MatchCandidatesCount"] = candidate_counts
-        work["MatchCandidates"] = candidates_list
-
-        # Split for review
-        matched_df = work[work["MatchConfidence"].eq("High")].copy()
-        ambiguous_df = work[work["MatchReason"].eq("Ambiguous")].copy()
-        unmatched_df = work[work["MatchReason"].isin(["NoMatch", "NoEmailDomain", "PersonalEmail"])].copy()
+        # Enrich in row batches so the per-batch temporaries stay bounded on large uploads
+        batches = [
+            enrich_batch(
+                leads.iloc[start:start + ENRICH_BATCH_ROWS],
+                email_col=email_col,
+                alias_map=alias_map,
+                account_index=account_index,
+                collapse_subdomains=collapse_subdomains,
+                treat_personal_as_unmatched=treat_personal_as_unmatched,
+            )
+            for start in range(0, max(len(leads), 1), ENRICH_BATCH_ROWS)
+        ]
+        work = batches[0] if len(batches) == 1 else pd.concat(batches)
+        if len(batches) > 1:
+            # Per-batch categories differ, so concat falls back to object; re-encode once
+            for c in ("EmailDomainRaw", "EmailDomainNormalized", "DomainCanonical"):
+                work[c] = work[c].astype("category")
+
+        # Split for review: one bucket per row, read straight off the MatchReason codes
+        bucket = REASON_BUCKET[work["MatchReason"].cat.codes.to_numpy()]
+        n_matched, n_ambiguous, n_unmatched = (int(n) for n in np.bincount(bucket, minlength=3))
+        ambiguous_df = work.iloc[np.flatnonzero(bucket == 1)]
 
         # Dedupe suggestions
         enriched_df, dedupe_df = dedupe_by_email(work, email_col=email_col)
@@ -356,19 +412,19 @@ if st.button("🚀 Enrich Leads", type="primary"):
     # ---------------------------
     st.subheader("📊 Results")
     m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Matched (High)", len(matched_df))
-    m2.metric("Ambiguous", len(ambiguous_df))
-    m3.metric("Unmatched", len(unmatched_df))
+    m1.metric("Matched (High)", n_matched)
+    m2.metric("Ambiguous", n_ambiguous)
+    m3.metric("Unmatched", n_unmatched)
     m4.metric("Potential duplicates", int(enriched_df["IsPotentialDuplicate"].sum()))
 
     with st.expander("✅ Matched (sample)"):
-        st.dataframe(matched_df.head(50))
+        st.dataframe(work.iloc[np.flatnonzero(bucket == 0)[:50]])
 
     with st.expander("⚠️ Ambiguous (sample)"):
         st.dataframe(ambiguous_df.head(50))
 
     with st.expander("❌ Unmatched (sample)"):
-        st.dataframe(unmatched_df.head(50))
+        st.dataframe(work.iloc[np.flatnonzero(bucket == 2)[:50]])
 
     # ---------------------------
     # Downloads
@@ -393,7 +449,7 @@ if st.button("🚀 Enrich Leads", type="primary"):
     # If no dedupes, still provide a file (empty)
     st.download_button(
         "⬇️ Download Dedupe Suggestions (CSV)",
-        data=df_to_csv_bytes(dedupe_df if not dedupe_df.empty else pd.DataFrame()),
+        data=EMPTY_CSV_BYTES if dedupe_df.empty else df_to_csv_bytes(dedupe_df),
         file_name="dedupe_suggestions.csv",
         mime="text/csv"
     )
@@ -403,9 +459,9 @@ if st.button("🚀 Enrich Leads", type="primary"):
         f"""
 **Summary**
 - Uploaded leads: **{len(leads)}**
-- Matched (High): **{len(matched_df)}**
-- Ambiguous: **{len(ambiguous_df)}**
-- Unmatched: **{len(unmatched_df)}**
+- Matched (High): **{n_matched}**
+- Ambiguous: **{n_ambiguous}**
+- Unmatched: **{n_unmatched}**
 - Potential duplicates: **{int(enriched_df["IsPotentialDuplicate"].sum())}**
 """
     )
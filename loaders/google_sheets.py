@@ -21,10 +21,12 @@ def load_google_csv(url: str) -> pd.DataFrame:
         raise ValueError("Google CSV url must be a non-empty string.")
 
     # pandas will raise if it can't fetch/parse
-    df = pd.read_csv(url)
+    df = pd.read_csv(url, engine="pyarrow", dtype_backend="pyarrow")
 
     # Defensive cleanup: drop totally empty columns created by export quirks
-    df = df.loc[:, ~df.columns.astype(str).str.match(r"^Unnamed")]
+    # (the pyarrow engine names them "" rather than "Unnamed: N")
+    cols = df.columns.astype(str)
+    df = df.loc[:, ~(cols.str.startswith("Unnamed") | (cols == ""))]
 
     return df
 
@@ -4,13 +4,19 @@
 from __future__ import annotations
 
 import re
+import string
 from typing import Optional
 
 import pandas as pd
+import streamlit as st
+import tldextract
 
 
 _EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
+# Scheme, "www." and path/query/fragment stripped in one pass; group 1 is the host.
+_HOST_RE = re.compile(r"^(?:https?://)?(?:www\.)?([^/?#\s]*)", re.IGNORECASE)
+
 
 def extract_email_domain(email: object) -> Optional[str]:
     """
@@ -33,38 +39,51 @@ def extract_email_domain(email: object) -> Optional[str]:
     return domain or None
 
 
+@st.cache_resource(show_spinner=False)
+def _suffix_extractor() -> tldextract.TLDExtract:
+    # Bundled Public Suffix List snapshot: no network fetch, no disk cache
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+def registrable_domain(domain: str) -> str:
+    """
+    Collapse a host to its registrable domain using the Public Suffix List:
+    mail.acme.com -> acme.com, shop.gamma.co.uk -> gamma.co.uk.
+
+    Hosts without a known public suffix (IPs, intranet names) fall back to the
+    last two labels.
+    """
+    ext = _suffix_extractor()(domain)
+    if ext.domain and ext.suffix:
+        return f"{ext.domain}.{ext.suffix}"
+    if ext.suffix:
+        # Bare public suffix (e.g. "co.uk"): nothing to collapse
+        return domain
+
+    head, _, tld = domain.rpartition(".")
+    _, sep, sld = head.rpartition(".")
+    return f"{sld}.{tld}" if sep else domain
+
+
 def normalize_domain(domain: object, collapse_subdomains: bool = True) -> Optional[str]:
     """
     Normalize a domain or URL-ish string into a comparable domain string.
 
     - lowercase
     - strips http/https, www, paths, trailing slashes
-    - optionally collapses subdomains (naive: last two labels)
-
-    NOTE: This naive collapse may not be correct for multi-level TLDs like .co.uk.
-    If you need that later, switch to tldextract.
+    - optionally collapses subdomains to the registrable domain (see registrable_domain)
     """
     if domain is None or (isinstance(domain, float) and pd.isna(domain)):
         return None
 
     d = str(domain).strip().lower()
-    if not d:
-        return None
-
-    d = re.sub(r"^https?://", "", d)
-    d = re.sub(r"^www\.", "", d)
-
-    # Remove path/query fragments
-    d = d.split("/")[0].strip()
-    d = d.split("?")[0].strip()
-    d = d.split("#")[0].strip()
+    d = _HOST_RE.match(d).group(1)
 
     if not d:
         return None
 
-    if collapse_subdomains and d.count(".") >= 2:
-        parts = d.split(".")
-        d = ".".join(parts[-2:])
+    if collapse_subdomains:
+        d = registrable_domain(d)
 
     return d or None
 
@@ -76,11 +95,14 @@ def normalize_website_to_domain(website: object, collapse_subdomains: bool = Tru
     return normalize_domain(website, collapse_subdomains=collapse_subdomains)
 
 
-_SUFFIXES_RE = re.compile(
-    r"\b(inc|inc\.|llc|l\.l\.c\.|ltd|ltd\.|limited|corp|corp\.|corporation|co|co\.|company|gmbh|s\.a\.|sa|sarl)\b",
-    re.IGNORECASE,
+_SUFFIX_TOKENS = frozenset(
+    {"inc", "llc", "ltd", "limited", "corp", "corporation", "co", "company", "gmbh", "sa", "sarl"}
 )
 
+# ASCII punctuation -> space ("_" is a word character and is kept, like [^\w\s])
+_PUNCT_TABLE = str.maketrans({c: " " for c in string.punctuation if c != "_"})
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
 
 def clean_company_name(name: object) -> str:
     """
@@ -97,8 +119,8 @@ def clean_company_name(name: object) -> str:
     if not s:
         return ""
 
-    s = _SUFFIXES_RE.sub("", s)
-    s = re.sub(r"[^\w\s]", " ", s)  # replace punctuation with space
-    s = re.sub(r"\s+", " ", s).strip()
+    # Punctuation to spaces first, so suffixes become whole tokens ("inc." -> "inc")
+    s = s.translate(_PUNCT_TABLE) if s.isascii() else _NON_WORD_RE.sub(" ", s)
 
-    return s
+    # Splitting on whitespace also normalizes it
+    return " ".join(t for t in s.split() if t not in _SUFFIX_TOKENS)
@@ -47,4 +47,4 @@ def drop_unnamed_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
     Drops export-artifact columns like 'Unnamed: 0'
     """
-    return df.loc[:, ~df.columns.astype(str).str.match(r"^Unnamed")]
+    return df.loc[:, ~df.columns.astype(str).str.startswith("Unnamed")]